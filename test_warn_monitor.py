@@ -0,0 +1,57 @@
+"""Regression tests for warn_monitor.py (run with `python -m pytest`)."""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import warn_monitor
+
+
+def make_warn_xlsx(rows):
+    """Build an in-memory WARN workbook with a 'Detailed WARN Report' sheet."""
+    pytest.importorskip("openpyxl")
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        pd.DataFrame({"Summary": ["WARN report"]}).to_excel(writer, sheet_name="Summary", index=False)
+        pd.DataFrame(rows).to_excel(writer, sheet_name="Detailed WARN Report", index=False)
+    return buffer.getvalue()
+
+
+def warn_rows():
+    rows = [
+        {
+            "County/Parish": "San Francisco",
+            "Notice Date": pd.Timestamp("2025-01-01") + pd.Timedelta(days=i),
+            "Effective Date": pd.Timestamp("2025-03-01"),
+            "Company": f"Company {i} Inc",
+            "No. Of Employees": i,
+        }
+        for i in range(60)
+    ]
+    # The only Fellers row has a blank Effective Date
+    rows[10].update({"Company": "Fellers LLC", "Effective Date": None})
+    rows[20]["Company"] = "Acme Widgets"
+    return rows
+
+
+def baseline_key(xlsx_bytes, company):
+    """Notice key as built from a full-sheet read (pre two-pass behaviour)."""
+    df = pd.read_excel(BytesIO(xlsx_bytes), sheet_name="Detailed WARN Report")
+    row = df[df["Company"] == company].iloc[0]
+    key = "|".join(str(row[col]) for col in warn_monitor.notice_key_columns(df.columns))
+    return warn_monitor.notice_digest(key)
+
+
+@pytest.mark.parametrize("targets", [["Fellers LLC"], ["Fellers LLC", "Acme Widgets"]])
+def test_notice_key_stable_for_blank_date(targets):
+    xlsx_bytes = make_warn_xlsx(warn_rows())
+    sheet = warn_monitor.parse_xlsx(xlsx_bytes)
+    matches = warn_monitor.read_company_matches(sheet, targets, state={})
+
+    company_state = {"seen_notices": []}
+    new_notices = warn_monitor.detect_new_notices(matches["Fellers LLC"], company_state)
+
+    assert len(new_notices) == 1
+    assert pd.isna(new_notices[0]["Effective Date"])
+    assert company_state["seen_notices"] == [baseline_key(xlsx_bytes, "Fellers LLC")]
@@ -6,14 +6,19 @@ Supports monitoring multiple companies in a single run.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import pandas as pd
 from io import BytesIO
 import json
 import hashlib
+import re
 from datetime import datetime
 from pathlib import Path
-from fuzzywuzzy import fuzz
+from concurrent.futures import ThreadPoolExecutor
+from rapidfuzz import fuzz, process, utils
+import numpy as np
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -29,6 +34,12 @@ CONFIG = {
     # List of companies to monitor - add as many as you want
     "target_companies": ["UCSF", "UC San Francisco", "University of California, San Francisco"],
     "fuzzy_match_threshold": 85,  # Similarity score (0-100) for fuzzy matching
+    # Per-company RapidFuzz scorer overrides, e.g. {"Anthropic": "partial_ratio"}.
+    # Default is token_set_ratio; partial_ratio is looser (e.g. "UCSD" ~ "UCSF")
+    "target_scorers": {},
+    # Only fuzzy-score names that contain one of the target's words (3+ chars).
+    # Much faster; set to False to also catch misspellings like "Antrhopic"
+    "substring_prefilter": True,
     "state_file": "warn_state.json",  # Tracks what we've already seen
     "email_alerts": True,  # Set to False to disable email notifications
     "smtp_config": {
@@ -42,6 +53,20 @@ CONFIG = {
     }
 }
 
+# Shared HTTP session so the page fetch and XLSX download reuse one pooled
+# connection to edd.ca.gov (one TCP+TLS handshake per run), with retries
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "warn-monitor/1.0"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# Precompiled href patterns for extract_xlsx_url
+XLSX_HREF_RE = re.compile(r'\.xlsx$', re.IGNORECASE)
+WARN_XLSX_HREF_RE = re.compile(r'warn.*\.xlsx$', re.IGNORECASE)
+
 # ============================================================================
 # CORE FUNCTIONS
 # ============================================================================
@@ -50,7 +75,7 @@ def fetch_warn_page(url):
     """Fetch the WARN notices page HTML."""
     print(f"[{datetime.now()}] Fetching WARN page...")
     try:
-        response = requests.get(url, timeout=30)
+        response = SESSION.get(url, timeout=30)
         response.raise_for_status()
         return response.text
     except requests.RequestException as e:
@@ -64,14 +89,17 @@ def extract_xlsx_url(html_content, base_url):
     Looks for links in the "Latest WARN Report" section.
     """
     print(f"[{datetime.now()}] Parsing HTML to find XLSX link...")
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(html_content, 'lxml')
+    
+    # Single scan for every link ending in ".xlsx"
+    all_xlsx_links = soup.find_all('a', href=XLSX_HREF_RE)
     
-    # Strategy 1: Find links containing "warn" and ending in ".xlsx"
-    xlsx_links = soup.find_all('a', href=lambda x: x and 'warn' in x.lower() and x.endswith('.xlsx'))
+    # Strategy 1: Prefer links containing "warn"
+    xlsx_links = [a for a in all_xlsx_links if WARN_XLSX_HREF_RE.search(a['href'])]
     
     if not xlsx_links:
-        # Strategy 2: Find any .xlsx link on the page
-        xlsx_links = soup.find_all('a', href=lambda x: x and x.endswith('.xlsx'))
+        # Strategy 2: Fall back to any .xlsx link on the page
+        xlsx_links = all_xlsx_links
     
     if not xlsx_links:
         print("ERROR: Could not find XLSX download link on page")
@@ -92,38 +120,72 @@ def extract_xlsx_url(html_content, base_url):
     return xlsx_url
 
 
-def download_xlsx(url):
-    """Download the XLSX file and return as bytes."""
+def download_xlsx(url, state=None):
+    """
+    Download the XLSX file and return (bytes, SHA256 hex digest).
+    Sends the ETag/Last-Modified recorded in `state` as a conditional request
+    and returns (None, None) if the server reports the file unchanged (HTTP 304).
+    """
     print(f"[{datetime.now()}] Downloading XLSX file...")
+    headers = {}
+    # Only ask for a 304 if we have a processed file hash to fall back on and
+    # the validators were issued for this same URL
+    if state and state.get("last_file_hash") and state.get("last_download_url") == url:
+        if state.get("last_etag"):
+            headers["If-None-Match"] = state["last_etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
     try:
-        response = requests.get(url, timeout=60)
+        response = SESSION.get(url, timeout=60, headers=headers, stream=True)
+        if response.status_code == 304:
+            print(f"[{datetime.now()}] Server reports XLSX not modified (HTTP 304)")
+            return None, None
         response.raise_for_status()
-        return response.content
+        
+        # Hash each chunk as it arrives instead of in a second pass afterwards
+        file_hash = hashlib.sha256()
+        chunks = []
+        for chunk in response.iter_content(chunk_size=65536):
+            file_hash.update(chunk)
+            chunks.append(chunk)
+        
+        if state is not None:
+            state["last_download_url"] = url
+            state["last_etag"] = response.headers.get("ETag")
+            state["last_modified"] = response.headers.get("Last-Modified")
+        return b"".join(chunks), file_hash.hexdigest()
     except requests.RequestException as e:
         print(f"ERROR: Failed to download XLSX: {e}")
         sys.exit(1)
 
 
 def parse_xlsx(xlsx_bytes):
-    """Parse XLSX bytes into a pandas DataFrame."""
+    """
+    Locate the WARN data in the XLSX bytes without reading the whole sheet.
+    Returns a dict with the open workbook, the sheet index, the number of
+    rows to skip above the header, and a sample DataFrame of the first rows.
+    Use read_sheet_columns / read_sheet_rows to load the data itself.
+    """
     print(f"[{datetime.now()}] Parsing XLSX file...")
     
-    from openpyxl import load_workbook
+    # calamine (Rust) is much faster than openpyxl's pure-Python XML parsing,
+    # and the workbook is opened once and reused for every attempt below
+    xls = pd.ExcelFile(BytesIO(xlsx_bytes), engine='calamine')
+    sheet_names = xls.sheet_names
+    print(f"[{datetime.now()}] Available sheets: {sheet_names}")
     
-    # First, inspect what sheets exist
-    wb = load_workbook(BytesIO(xlsx_bytes))
-    print(f"[{datetime.now()}] Available sheets: {wb.sheetnames}")
+    # Try the known data sheet first, then the first 5 sheets
+    sheet_order = list(range(min(5, len(sheet_names))))
+    if 'Detailed WARN Report' in sheet_names:
+        preferred = sheet_names.index('Detailed WARN Report')
+        sheet_order = [preferred] + [i for i in sheet_order if i != preferred]
     
     # Try all combinations of sheets and skip rows
-    for sheet_idx in range(min(5, len(wb.sheetnames))):  # Try first 5 sheets
+    for sheet_idx in sheet_order:
         for skiprows in range(6):  # Try skipping 0-5 rows
             try:
-                df = pd.read_excel(
-                    BytesIO(xlsx_bytes),
-                    engine='openpyxl',
-                    sheet_name=sheet_idx,
-                    skiprows=skiprows
-                )
+                # 51 rows are enough to validate the layout below
+                df = xls.parse(sheet_name=sheet_idx, skiprows=skiprows, nrows=51)
                 
                 # Validation: check if this looks like valid WARN data
                 if len(df) > 50:  # Should have many records
@@ -140,22 +202,53 @@ def parse_xlsx(xlsx_bytes):
                         cols_str = ' '.join(str(c).lower() for c in df.columns[:10])
                         if any(keyword in cols_str for keyword in ['county', 'company', 'notice', 'layoff', 'business']):
                             print(f"[{datetime.now()}] ✓ Found valid data: sheet {sheet_idx}, skiprows={skiprows}")
-                            print(f"[{datetime.now()}] Sheet name: '{wb.sheetnames[sheet_idx]}'")
-                            print(f"[{datetime.now()}] Found {len(df)} total WARN notices")
+                            print(f"[{datetime.now()}] Sheet name: '{sheet_names[sheet_idx]}'")
                             print(f"[{datetime.now()}] All columns: {list(df.columns)}")
-                            return df
+                            return {"xls": xls, "sheet_idx": sheet_idx, "skiprows": skiprows, "sample": df}
             except Exception as e:
                 continue
     
     # Fallback: use sheet 2 with 5 rows skipped (common pattern)
     print(f"[{datetime.now()}] WARNING: No ideal parse found, using fallback")
-    df = pd.read_excel(BytesIO(xlsx_bytes), engine='openpyxl', sheet_name=2, skiprows=5)
+    df = xls.parse(sheet_name=2, skiprows=5, nrows=51)
     print(f"[{datetime.now()}] Columns: {list(df.columns)}")
+    return {"xls": xls, "sheet_idx": 2, "skiprows": 5, "sample": df}
+
+
+def read_sheet_columns(sheet, usecols):
+    """Read only the given columns of every row in the sheet located by parse_xlsx."""
+    return sheet["xls"].parse(
+        sheet_name=sheet["sheet_idx"],
+        skiprows=sheet["skiprows"],
+        usecols=usecols
+    )
+
+
+def read_sheet_rows(sheet, positions):
+    """
+    Read all columns for the given 0-based data row positions of the sheet
+    located by parse_xlsx. The result is indexed by those positions so it
+    lines up with read_sheet_columns output.
+    """
+    positions = sorted(set(positions))
+    if not positions:
+        return sheet["sample"].iloc[0:0]
+    
+    header = sheet["skiprows"]
+    wanted = {header + 1 + pos for pos in positions}
+    df = sheet["xls"].parse(
+        sheet_name=sheet["sheet_idx"],
+        # Keep only the header row and the wanted rows
+        skiprows=lambda r: r != header and r not in wanted
+    )
+    df.index = positions
     return df
 
-def fuzzy_match_company(company_name, target, threshold=85):
+def fuzzy_match_company(company_name, target, score, threshold=85):
     """
     Use fuzzy string matching to detect company name variations.
+    `score` is the similarity already computed by filter_company_records
+    with the scorer chosen for this target.
     Returns True if similarity score >= threshold.
     """
     if pd.isna(company_name):
@@ -175,9 +268,6 @@ def fuzzy_match_company(company_name, target, threshold=85):
             return False
         return True
     
-    # Calculate similarity score
-    score = fuzz.token_set_ratio(company_clean, target_clean)
-    
     # Extra validation for high-scoring matches
     if score >= threshold:
         # If target is short (like a location name), require exact word match
@@ -198,13 +288,24 @@ def fuzzy_match_company(company_name, target, threshold=85):
     return score >= threshold
 
 
-def filter_company_records(df, target_company, threshold=85):
+def substring_prefilter(names, target_clean):
     """
-    Filter DataFrame for records matching the target company.
-    Uses fuzzy matching to handle name variations.
+    Cheap pre-check before fuzzy scoring: True for names containing at least
+    one of the target's significant (3+ character) words.
+    """
+    target_tokens = [t for t in utils.default_process(target_clean).split() if len(t) >= 3]
+    if not target_tokens:
+        # Nothing distinctive to look for - let every name through
+        return np.ones(len(names), dtype=bool)
+    pattern = "|".join(map(re.escape, target_tokens))
+    return names.str.contains(pattern, na=False, regex=True).to_numpy(dtype=bool)
+
+
+def detect_company_column(df):
+    """
+    Identify the column holding company names.
+    Only needs the header and a sample of rows, not the full sheet.
     """
-    print(f"[{datetime.now()}] Filtering for company: {target_company}")
-    
     # Try to identify the company name column
     # Prioritize company-specific keywords (not just "notice" which could be "notice date")
     high_priority_keywords = ['company', 'employer', 'business']
@@ -273,18 +374,172 @@ def filter_company_records(df, target_company, threshold=85):
         print(f"[{datetime.now()}] Using first column: '{company_col}'")
     
     print(f"[{datetime.now()}] Using column '{company_col}' for company matching")
+    return company_col
+
+
+def normalize_company_names(values):
+    """
+    Strip and lowercase a column of company names in one vectorized pass.
+    Uses the Arrow-backed string dtype so later .str operations run in
+    Arrow's C++ kernels instead of per-object Python calls.
+    """
+    # Missing names become "" and never match
+    return values.astype('string[pyarrow]').fillna("").str.strip().str.lower()
+
+
+def choose_scorer(target, overrides=None):
+    """
+    Pick the RapidFuzz scorer name for a target company.
+    Defaults to token_set_ratio; other scorers (e.g. partial_ratio) are
+    opt-in per company since they change which names match.
+    """
+    if overrides and target in overrides:
+        return overrides[target]
+    return "token_set_ratio"
+
+
+def filter_company_records(names, target_companies, threshold=85, state=None, prefilter=True,
+                           scorers=None):
+    """
+    Find records matching each target company.
+    `names` is the company column as returned by normalize_company_names.
+    Uses fuzzy matching to handle name variations.
+    Returns a dict mapping each target company to its matching entries of
+    `names` (indexed by row position in the sheet).
+    If `state` is given, similarity scores are cached in it across runs.
+    With `prefilter`, only names passing substring_prefilter are scored.
+    `scorers` overrides choose_scorer per company.
+    """
+    print(f"[{datetime.now()}] Filtering for companies: {', '.join(target_companies)}")
+    
+    targets_clean = [target.strip().lower() for target in target_companies]
+    scorer_names = [choose_scorer(company, scorers) for company in target_companies]
+    
+    # Per-company score caches keyed by normalized name; most rows carry
+    # over between reports, so only names not seen before get scored.
+    # Scorer and threshold are part of the key so changing either never
+    # reuses old scores
+    if state is None:
+        state = {}
+    unique_names = pd.unique(names)
+    cache_keys = [
+        state_key(f"fuzzy_cache_{scorer_name}_{threshold}", company)
+        for company, scorer_name in zip(target_companies, scorer_names)
+    ]
+    caches = [state.get(key, {}) for key in cache_keys]
+    
+    # Cheap substring prefilter; names failing it for a target score 0 against
+    # it and are never cached, so toggling the prefilter can't serve stale scores
+    # Explicit (names x targets) shapes so an empty sheet or target list works
+    shape = (len(unique_names), len(targets_clean))
+    unique_series = pd.Series(unique_names, dtype='string[pyarrow]')
+    hits = np.ones(shape, dtype=bool)
+    if prefilter:
+        for col_idx, target_clean in enumerate(targets_clean):
+            hits[:, col_idx] = substring_prefilter(unique_series, target_clean)
+    cached = np.array(
+        [[name in cache for cache in caches] for name in unique_names], dtype=bool
+    ).reshape(shape)
+    needed = hits & ~cached
+    rows = np.flatnonzero(needed.any(axis=1))
+    print(f"[{datetime.now()}] Scoring {len(rows)} of {len(unique_names)} unique names")
+    
+    # One cdist matrix per scorer, covering all the targets that use it.
+    # score_cutoff lets RapidFuzz bail out early on pairs that cannot reach
+    # the threshold (they score 0); -0.5 keeps scores that round up to it
+    for scorer_name in sorted(set(scorer_names)):
+        cols = [j for j, name in enumerate(scorer_names) if name == scorer_name]
+        group_rows = rows[needed[rows][:, cols].any(axis=1)]
+        if not group_rows.size:
+            continue
+        fresh = process.cdist(
+            unique_names[group_rows].tolist(),
+            [targets_clean[j] for j in cols],
+            scorer=getattr(fuzz, scorer_name),
+            processor=utils.default_process,
+            score_cutoff=max(threshold - 0.5, 0),
+            dtype=np.uint8,
+            workers=-1,
+        )
+        for fresh_col, col_idx in enumerate(cols):
+            caches[col_idx].update(
+                (unique_names[i], score)
+                for i, score, need in zip(group_rows, fresh[:, fresh_col].tolist(), needed[group_rows, col_idx])
+                if need
+            )
+    
+    # Keep only names in the current report so the cache doesn't grow unbounded,
+    # and drop caches for companies or scorers no longer configured
+    for key in [key for key in state if key.startswith("fuzzy_cache_") and key not in cache_keys]:
+        del state[key]
+    for key, cache in zip(cache_keys, caches):
+        state[key] = {name: cache[name] for name in unique_names if name in cache}
+    
+    # Decide each distinct name once, then map the verdicts back to rows
+    present = (unique_series != "").to_numpy(dtype=bool)
+    lengths = unique_series.str.len().to_numpy(dtype=np.int64)
+    
+    all_matches = {}
+    for company, target_clean, cache in zip(target_companies, targets_clean, caches):
+        scores = unique_series.map(cache).fillna(0).to_numpy(dtype=np.uint8)
+        
+        # Only high scorers and substring hits can match - run the
+        # location/parenthetical checks in fuzzy_match_company on those alone
+        substring = unique_series.str.contains(target_clean, regex=False).to_numpy(dtype=bool, copy=True)
+        for i in np.flatnonzero(lengths <= len(target_clean)):
+            substring[i] |= unique_names[i] in target_clean
+        candidates = np.flatnonzero(present & ((scores >= threshold) | substring))
+        
+        matched_names = [
+            unique_names[i] for i in candidates
+            if fuzzy_match_company(unique_names[i], target_clean, scores[i], threshold)
+        ]
+        all_matches[company] = names[names.isin(matched_names)]
+        print(f"[{datetime.now()}] Found {len(all_matches[company])} matching records for {company}")
+    
+    return all_matches
+
+
+def read_company_matches(sheet, target_companies, threshold=85, state=None, prefilter=True,
+                         scorers=None):
+    """
+    Match target companies against the sheet located by parse_xlsx.
+    The first pass reads only the company and notice-key columns for every
+    row; full rows are then read only for the matches.
+    Returns a dict mapping each target company to its matching records.
+    """
+    company_col = detect_company_column(sheet["sample"])
+    key_cols = notice_key_columns(sheet["sample"].columns)
+    first_pass_cols = [company_col] + [col for col in key_cols if col != company_col]
+    first_pass = read_sheet_columns(sheet, first_pass_cols)
+    print(f"[{datetime.now()}] Found {len(first_pass)} total WARN notices")
+    
+    # Normalize once for all companies, then match in one pass
+    names = normalize_company_names(first_pass[company_col])
+    company_matches = filter_company_records(names, target_companies, threshold, state, prefilter, scorers)
+    
+    # Second pass: load full rows only for the matched records
+    matched_positions = set()
+    for matches in company_matches.values():
+        matched_positions.update(matches.index)
+    matched_rows = read_sheet_rows(sheet, matched_positions)
+    
+    # Column types in the subset depend on which rows matched (e.g. an
+    # all-blank date column reads as float, "nan" instead of "NaT"); take the
+    # key columns from the full-sheet pass so notice keys stay stable
+    for col in key_cols:
+        matched_rows[col] = first_pass.loc[matched_rows.index, col]
     
-    # Apply fuzzy matching
-    matches = df[df[company_col].apply(
-        lambda x: fuzzy_match_company(x, target_company, threshold)
-    )]
-    
-    print(f"[{datetime.now()}] Found {len(matches)} matching records")
-    return matches
+    return {
+        company: matched_rows.loc[matches.index]
+        for company, matches in company_matches.items()
+    }
 
-def compute_file_hash(xlsx_bytes):
-    """Compute SHA256 hash of the XLSX file for change detection."""
-    return hashlib.sha256(xlsx_bytes).hexdigest()
+
+def state_key(prefix, company):
+    """Build a per-company state key, e.g. 'seen_notices_UC_San_Francisco'."""
+    # Sanitize company name for use as dictionary key
+    return f"{prefix}_{company.replace(' ', '_').replace(',', '').replace('.', '')}"
 
 
 def load_state(state_file):
@@ -296,6 +551,9 @@ def load_state(state_file):
     return {
         "last_file_hash": None,
         "last_check": None,
+        "last_download_url": None,
+        "last_etag": None,
+        "last_modified": None,
         # Note: seen_notices will be stored per-company as "seen_notices_CompanyName"
     }
 
@@ -306,6 +564,24 @@ def save_state(state_file, state):
         json.dump(state, f, indent=2)
 
 
+def notice_digest(notice_key):
+    """Compact fixed-width (16 hex chars) digest of a notice key for state storage."""
+    return hashlib.blake2b(notice_key.encode(), digest_size=8).hexdigest()
+
+
+def is_notice_digest(value):
+    """True if value is already a notice_digest() rather than a raw key."""
+    return len(value) == 16 and all(c in '0123456789abcdef' for c in value)
+
+
+def notice_key_columns(columns):
+    """
+    Columns that make up a notice's identity key.
+    Common patterns: Company + Notice Date or Company + Layoff Date
+    """
+    return [col for col in columns if 'date' in str(col).lower() or 'company' in str(col).lower()]
+
+
 def detect_new_notices(current_matches, state):
     """
     Detect which notices are new since last check.
@@ -314,30 +590,33 @@ def detect_new_notices(current_matches, state):
     if current_matches.empty:
         return []
     
-    seen_notices = set(state.get("seen_notices", []))
-    new_notices = []
+    # Older state files stored the raw keys - digest them so they still match
+    seen_notices = {
+        key if is_notice_digest(key) else notice_digest(key)
+        for key in state.get("seen_notices", [])
+    }
     
     # Create a unique identifier for each notice
     # Using company + date as a simple key
-    for _, row in current_matches.iterrows():
-        # Convert row to dict and create identifier
-        notice_dict = row.to_dict()
-        
-        # Try to create a unique key (adapt based on actual column names)
-        # Common patterns: Company + Notice Date or Company + Layoff Date
-        key_parts = []
-        for col in row.index:
-            if 'date' in str(col).lower() or 'company' in str(col).lower():
-                key_parts.append(str(row[col]))
-        
-        notice_key = "|".join(key_parts) if key_parts else str(hash(str(row.to_dict())))
-        
-        if notice_key not in seen_notices:
-            new_notices.append(notice_dict)
-            seen_notices.add(notice_key)
+    key_cols = notice_key_columns(current_matches.columns)
+    
+    if key_cols:
+        # Build "value|value|..." keys a column at a time rather than per row;
+        # map(str) keeps the same text as str(cell), e.g. "2025-01-15 00:00:00"
+        keys = current_matches[key_cols[0]].map(str)
+        for col in key_cols[1:]:
+            keys = keys + "|" + current_matches[col].map(str)
+    else:
+        keys = pd.util.hash_pandas_object(current_matches, index=False).astype(str)
+    keys = keys.map(notice_digest)
     
-    # Update state with all current notices
-    state["seen_notices"] = list(seen_notices)
+    # New if never seen before (and not a repeat within this sheet)
+    new_mask = ~keys.isin(seen_notices) & ~keys.duplicated()
+    new_notices = current_matches.loc[new_mask].to_dict('records')
+    seen_notices.update(keys)
+    
+    # Update state with all current notices (sorted so state diffs stay small)
+    state["seen_notices"] = sorted(seen_notices)
     
     return new_notices
 
@@ -447,8 +726,11 @@ def main():
     # Fetch and parse the WARN page (once for all companies)
     html_content = fetch_warn_page(CONFIG['warn_page_url'])
     xlsx_url = extract_xlsx_url(html_content, CONFIG['warn_page_url'])
-    xlsx_bytes = download_xlsx(xlsx_url)
-    file_hash = compute_file_hash(xlsx_bytes)
+    xlsx_bytes, file_hash = download_xlsx(xlsx_url, state)
+    
+    # A 304 means the server-side file is the one we last processed
+    if xlsx_bytes is None:
+        file_hash = state['last_file_hash']
     
     # Check if file has changed since last run
     if file_hash == state.get('last_file_hash'):
@@ -460,27 +742,28 @@ def main():
     
     print(f"[{datetime.now()}] File has changed (new hash: {file_hash[:16]}...)")
     
-    # Parse once (efficient - only parse the Excel file once for all companies)
-    df = parse_xlsx(xlsx_bytes)
+    # Locate the data, then match companies reading only the columns needed
+    sheet = parse_xlsx(xlsx_bytes)
+    company_matches = read_company_matches(
+        sheet,
+        CONFIG['target_companies'],
+        CONFIG['fuzzy_match_threshold'],
+        state,
+        CONFIG.get('substring_prefilter', True),
+        CONFIG.get('target_scorers')
+    )
     
     # Track all new notices across all companies
     all_new_notices = {}
     
     # Check each company
-    for company in CONFIG['target_companies']:
+    for company, matches in company_matches.items():
         print(f"\n{'='*70}")
         print(f"Checking company: {company}")
         print(f"{'='*70}")
         
-        matches = filter_company_records(
-            df, 
-            company,
-            CONFIG['fuzzy_match_threshold']
-        )
-        
         # Use company-specific state tracking
-        # Sanitize company name for use as dictionary key
-        company_key = f"seen_notices_{company.replace(' ', '_').replace(',', '').replace('.', '')}"
+        company_key = state_key("seen_notices", company)
         company_state = {
             "seen_notices": state.get(company_key, [])
         }
@@ -500,21 +783,28 @@ def main():
         # Update state for this company
         state[company_key] = company_state["seen_notices"]
     
-    # Send consolidated email if any new notices found
     if all_new_notices:
         print(f"\n{'='*70}")
         print(f"SUMMARY: Found new notices for {len(all_new_notices)} companies")
         print(f"{'='*70}")
-        send_consolidated_email_alert(all_new_notices, CONFIG)
     else:
         print(f"\n{'='*70}")
         print(f"SUMMARY: No new notices found for any monitored companies")
         print(f"{'='*70}")
     
-    # Update and save state
+    # Update state
     state['last_file_hash'] = file_hash
     state['last_check'] = datetime.now().isoformat()
-    save_state(CONFIG['state_file'], state)
+    
+    # Send consolidated email if any new notices found; the SMTP round-trips
+    # run on a worker thread while the state file is written
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        email_future = None
+        if all_new_notices:
+            email_future = executor.submit(send_consolidated_email_alert, all_new_notices, CONFIG)
+        save_state(CONFIG['state_file'], state)
+        if email_future is not None:
+            email_future.result()
     
     print("=" * 70)
     print(f"[{datetime.now()}] Monitor run completed successfully")